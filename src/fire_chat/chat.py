@@ -3,6 +3,7 @@ from pydantic import BaseModel, model_validator
 from rich.markdown import Markdown
 
 from fire_chat.config import Config
+from fire_chat.tools.attachment import Attachment, AttachResult, find_attachments
 from fire_chat.tools.history import History
 from fire_chat.message import Messages, Message
 
@@ -19,6 +20,7 @@ class LLMChat(BaseModel):
     messages: Messages = Messages()
     history: History | None = None
     system_message: Message = SYSTEM_MESSAGE
+    attached_files: dict[str, str] = {}  # content digest to the path it was first attached from
 
     @model_validator(mode="after")
     def load_history(self):
@@ -50,7 +52,8 @@ class LLMChat(BaseModel):
         if not response.choices:
             raise ValueError(f"Did not receive a valid choice from model '{self.config.model}'")
 
-        # try update budget if budget is set
+        # record the cost for reporting and try update budget if budget is set
+        self.config.budget.record_cost(response)
         if self.config.budget.is_on:
             self.config.budget.update_cost(response)
 
@@ -59,7 +62,18 @@ class LLMChat(BaseModel):
         self.messages.append(resp_message)
         return Markdown(resp_message.content) if markdown else resp_message.content
 
+    def find_attachments(self, pattern: str) -> AttachResult:
+        """Find files matching `pattern`, files with content attached before are only referenced."""
+        return find_attachments(pattern, self.attached_files)
+
+    def add_attachments(self, attachments: list[Attachment]) -> None:
+        for attachment in attachments:
+            self.messages.extend(Message(role="user", content=content) for content in attachment.contents)
+            # only record files attached in full, so a partially attached file can still be attached in full later
+            if attachment.identical_to is None and attachment.is_complete:
+                self.attached_files.setdefault(attachment.digest, attachment.path)
+
     def save_history(self, path: str | None = None) -> None:
         if self.history is not None:
             self.history.messages.extend(self.messages)
-            self.history.save(path)
+            self.history.save(path, compression=self.config.history.compression)
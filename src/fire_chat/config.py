@@ -15,11 +15,14 @@ from fire_chat.constants import (
     DEFAULT_TEMPERATURE,
     DEFAULT_HISTORY_STORAGE_FORMAT,
     HistoryStorageFormat,
+    DEFAULT_HISTORY_COMPRESSION,
+    HistoryCompression,
     DEFAULT_EMBEDDING_MODEL,
     DEFAULT_EMBEDDING_DIMENSION,
     DEFAULT_MAX_TOKENS,
     DEFAULT_SHOW_SPINNER,
     DEFAULT_MULTILINE,
+    DEFAULT_SHOW_ESTIMATE,
     CustomYamlDumper,
 )
 from fire_chat.tools.budget import Budget
@@ -28,11 +31,15 @@ from fire_chat.tools.provider import Provider
 from fire_chat.ui import console, ConsoleStyle
 
 
-class HistoryConf(BaseModel):
+class HistoryConf(BaseModel, validate_assignment=True):
     enabled: bool = field(
         default=False, metadata={"description": "If enabled, will save history at the end of the chat."}
     )
     storage_format: HistoryStorageFormat = DEFAULT_HISTORY_STORAGE_FORMAT
+    compression: HistoryCompression = field(
+        default=DEFAULT_HISTORY_COMPRESSION,
+        metadata={"description": "Compression used for newly created history files ('none', 'gzip' or 'zstd')."},
+    )
 
 
 class Config(BaseModel, validate_assignment=True):
@@ -50,6 +57,7 @@ class Config(BaseModel, validate_assignment=True):
     show_spinner: bool = DEFAULT_SHOW_SPINNER
     multiline: bool = DEFAULT_MULTILINE
     use_markdown: bool = True
+    show_estimate: bool = DEFAULT_SHOW_ESTIMATE
 
     # budgeting
     budget: Budget = Budget()
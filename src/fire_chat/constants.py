@@ -19,17 +19,22 @@ for logger in loggers:
     logger.setLevel(LOGGING_LEVEL)
 
 HistoryStorageFormat = Literal["json", "markdown"]
+HistoryCompression = Literal["none", "gzip", "zstd"]
 
 DEFAULT_PROVIDER = "openai"
 DEFAULT_MODEL = "gpt-4o"
 DEFAULT_TEMPERATURE = 0.2
 DEFAULT_HISTORY_STORAGE_FORMAT = "json"
+DEFAULT_HISTORY_COMPRESSION = "gzip"
 DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
 DEFAULT_EMBEDDING_DIMENSION = 1536
 DEFAULT_SHOW_SPINNER = True
 DEFAULT_MULTILINE = False
 DEFAULT_USE_MARKDOWN = True
+DEFAULT_SHOW_ESTIMATE = True
 DEFAULT_MAX_TOKENS = 4096
+DEFAULT_ATTACHMENT_CHUNK_TOKENS = 4096
+DEFAULT_MAX_ATTACHMENT_FILES = 100
 
 
 class CustomYamlDumper(Dumper):
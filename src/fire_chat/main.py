@@ -7,8 +7,10 @@ from rich.text import Text
 
 from fire_chat.chat import LLMChat
 from fire_chat.config import Config, Provider
-from fire_chat.constants import PROJECT_NAME
+from fire_chat.constants import DEFAULT_MAX_ATTACHMENT_FILES, PROJECT_NAME
+from fire_chat.tools.estimate import PromptEstimator
 from fire_chat.tools.history import History
+from fire_chat.tools.report import CostRecords, Period, display_report
 from fire_chat.ui import console, ConsoleStyle
 from fire_chat.ui import create_keybindings, PROMPT_STYLE
 
@@ -20,6 +22,7 @@ app = typer.Typer(
 )
 
 SPINNER = "bouncingBar"
+ATTACH_COMMAND = "/attach"
 
 
 def process_prompt(chat: LLMChat, prompt: str, index: int, *, use_markdown: bool, use_spinner: bool) -> None:
@@ -34,6 +37,75 @@ def process_prompt(chat: LLMChat, prompt: str, index: int, *, use_markdown: bool
     console.print("")
 
 
+def process_attach(chat: LLMChat, estimator: PromptEstimator, pattern: str) -> None:
+    if not pattern:
+        console.print(f"Usage: {ATTACH_COMMAND} <path|glob>", style=ConsoleStyle.bold_red)
+        return
+    result = chat.find_attachments(pattern)
+    for path, error in result.errors.items():
+        console.print(f"Failed to read '{path}': {error}", style=ConsoleStyle.bold_red)
+    if not result.attachments and not result.binaries and not result.errors:
+        console.print(f"No files found matching '{pattern}'.", style=ConsoleStyle.bold_red)
+        return
+
+    # only attach what still leaves room in the context window and the budget, large files are cut short
+    attachments, not_attached, omitted_chunks = [], [], {}
+    fits = estimator.fit(attachment.iter_contents() for attachment in result.attachments)
+    for attachment, n_chunks in zip(result.attachments, fits):
+        # a file identical to one that was not attached is not attached either
+        if not n_chunks or attachment.identical_to in not_attached:
+            not_attached.append(attachment.path)
+            continue
+        if attachment.identical_to is None and n_chunks < len(attachment.chunks):
+            omitted_chunks[attachment.path] = len(attachment.chunks) - n_chunks
+            attachment = attachment.leading(n_chunks)
+        attachments.append(attachment)
+    chat.add_attachments(attachments)
+
+    identical = sum(attachment.identical_to is not None for attachment in attachments)
+    console.print(
+        f"Attached {len(attachments) - identical} file(s) as {sum(len(a.contents) for a in attachments)} message(s), "
+        f"{identical} identical to other attached files, skipped {len(result.binaries)} binary file(s).",
+        style=ConsoleStyle.bold_green,
+    )
+    if omitted_chunks:
+        console.print(
+            f"Left out {sum(omitted_chunks.values())} part(s) that would exceed the context window or the budget: "
+            + ", ".join(f"{path} ({n_chunks} part(s))" for path, n_chunks in omitted_chunks.items()),
+            style=ConsoleStyle.bold_red,
+        )
+    if not_attached:
+        console.print(
+            f"Not attached, would exceed the context window or the budget: {', '.join(not_attached)}",
+            style=ConsoleStyle.bold_red,
+        )
+    if result.skipped:
+        console.print(
+            f"Not attached {result.skipped} file(s) over the maximum of {DEFAULT_MAX_ATTACHMENT_FILES} files.",
+            style=ConsoleStyle.bold_red,
+        )
+
+
+def check_prompt(estimator: PromptEstimator, prompt: str) -> bool:
+    """Block the turn before it is sent if it would overflow the context window or the remaining budget."""
+    estimate = estimator.estimate_prompt(prompt)
+    if estimate.exceeds_context:
+        console.print(
+            f"Prompt not sent: ~{estimate.tokens:,} input tokens exceed the context window of "
+            f"{estimate.max_input_tokens:,} tokens.",
+            style=ConsoleStyle.bold_red,
+        )
+        return False
+    if estimate.exceeds_budget:
+        console.print(
+            f"Prompt not sent: estimated cost ${estimate.cost:.4f} exceeds the remaining budget "
+            f"${estimate.remaining_budget:.4f}.",
+            style=ConsoleStyle.bold_red,
+        )
+        return False
+    return True
+
+
 def print_header(config: Config):
     console.print()
     console.print(Text(f"Welcome to {PROJECT_NAME}!", style=ConsoleStyle.bold_yellow))
@@ -42,8 +114,9 @@ def print_header(config: Config):
     console.print()
 
 
-@app.command()
+@app.callback(invoke_without_command=True)
 def main(
+    ctx: typer.Context,
     # provider configs
     provider: Annotated[str | None, typer.Option(help="Providers to use")] = None,
     provider_api_key: Annotated[str | None, typer.Option(help="The API key for the provider to use")] = None,
@@ -58,6 +131,9 @@ def main(
     show_spinner: Annotated[bool | None, typer.Option(help="Show spinner")] = None,
     multiline: Annotated[bool | None, typer.Option(help="If accepts multilines in prompt input")] = None,
     use_markdown: Annotated[bool | None, typer.Option(help="If use markdown format in console output")] = None,
+    show_estimate: Annotated[
+        bool | None, typer.Option(help="Show estimated input tokens and cost of the prompt while typing")
+    ] = None,
     # budget configs
     budget: Annotated[bool | None, typer.Option(help="Enable budget")] = None,
     budget_duration: Annotated[str | None, typer.Option(help="Budget duration")] = None,
@@ -66,9 +142,17 @@ def main(
     # history configs
     history: Annotated[bool | None, typer.Option(help="Enable history")] = None,
     storage_format: Annotated[str | None, typer.Option(help="Storage format")] = None,
-    load_history_from: Annotated[str | None, typer.Option(help="Load history from")] = None,
+    history_compression: Annotated[
+        str | None, typer.Option(help="Compression of saved history: 'none', 'gzip' or 'zstd'")
+    ] = None,
+    load_history_from: Annotated[str | None, typer.Option(help="Load history from (file name or fsspec url)")] = None,
+    load_history_turns: Annotated[int | None, typer.Option(min=1, help="Only load the last N turns of history")] = None,
     save_history_to: Annotated[str | None, typer.Option(help="Save history")] = None,
 ) -> None:
+    """Chat with LLM models, options override the config file."""
+    if ctx.invoked_subcommand is not None:
+        return
+
     # loading configs from config file
     config = Config.load()
 
@@ -91,6 +175,8 @@ def main(
         config.multiline = multiline
     if use_markdown is not None:
         config.use_markdown = use_markdown
+    if show_estimate is not None:
+        config.show_estimate = show_estimate
     if budget:
         config.budget.enabled = True
         if budget_user is not None:
@@ -104,19 +190,39 @@ def main(
         config.history.enabled = True
         if storage_format is not None:
             config.history.storage_format = storage_format
+        if history_compression is not None:
+            config.history.compression = history_compression
         if load_history_from is not None:
-            _history = History.load(load_history_from)
+            _history = History.load(load_history_from, last_n_turns=load_history_turns)
 
     config.validate_api_key()
 
     # start prompt session
-    session = PromptSession(key_bindings=create_keybindings(config.multiline))
     print_header(config)
     chat = LLMChat(config=config, history=_history)
+    estimator = PromptEstimator(chat)
+    session = PromptSession(
+        key_bindings=create_keybindings(config.multiline),
+        bottom_toolbar=estimator.toolbar if config.show_estimate else None,
+    )
+    if config.show_estimate:
+        estimator.attach(session)
     try:
         index = 1
+        default = ""
         while True:
-            prompt = session.prompt(f"user [{index}]: ", style=PROMPT_STYLE)
+            if config.show_estimate:
+                estimator.schedule(default)
+            prompt = session.prompt(f"user [{index}]: ", style=PROMPT_STYLE, default=default)
+            default = ""
+            command, *argument = prompt.strip().split(maxsplit=1) or [""]
+            if command == ATTACH_COMMAND:
+                process_attach(chat, estimator, argument[0] if argument else "")
+                continue
+            if not check_prompt(estimator, prompt):
+                # let the user edit the blocked prompt instead of pasting it again
+                default = prompt
+                continue
             process_prompt(chat, prompt, index, use_markdown=config.use_markdown, use_spinner=config.show_spinner)
             index += 1
     except KeyboardInterrupt:
@@ -130,5 +236,19 @@ def main(
             chat.save_history(save_history_to)
 
 
+@app.command()
+def report(
+    user: Annotated[str | None, typer.Option(help="Only report the spend of this user")] = None,
+    period: Annotated[Period, typer.Option(help="Group spend by day, week or month")] = Period.day,
+    last: Annotated[int, typer.Option(min=1, help="Number of most recent periods to show")] = 14,
+) -> None:
+    """Show spend analytics over the recorded cost data."""
+    config = Config.load()
+    records = CostRecords.load()
+    if user is not None:
+        records = records.filter_user(user)
+    display_report(records, config.budget, period=period, last=last)
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,195 @@
+import glob
+import hashlib
+import mmap
+import os
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field, replace
+from functools import cached_property, lru_cache
+from pathlib import Path
+
+from typing_extensions import Self
+
+from fire_chat.constants import DEFAULT_ATTACHMENT_CHUNK_TOKENS, DEFAULT_MAX_ATTACHMENT_FILES
+
+CHARS_PER_TOKEN = 4
+BINARY_SNIFF_BYTES = 8192
+MAX_CACHED_FILES = 256
+
+# skipped when expanding directories and wildcards, together with any hidden file or directory
+IGNORED_DIRS = frozenset({"node_modules", "venv", "__pycache__", "site-packages"})
+
+
+@dataclass(frozen=True)
+class Chunk:
+    path: str
+    index: int
+    total: int
+    start: int  # byte offsets in the file
+    end: int
+
+    @cached_property
+    def text(self) -> str:
+        """Only read and decode when needed, so chunks that are not attached are never decoded."""
+        if self.start == self.end:
+            return ""
+        with open(self.path, "rb") as f:
+            f.seek(self.start)
+            return f.read(self.end - self.start).decode("utf-8", errors="replace")
+
+    @property
+    def content(self) -> str:
+        part = f" (part {self.index + 1}/{self.total})" if self.total > 1 else ""
+        return f"File `{self.path}`{part}:\n```\n{self.text.rstrip()}\n```"
+
+
+@dataclass(frozen=True)
+class Attachment:
+    path: str
+    digest: str
+    chunks: tuple[Chunk, ...] = ()
+    identical_to: str | None = None
+
+    @property
+    def contents(self) -> list[str]:
+        return list(self.iter_contents())
+
+    def iter_contents(self) -> Iterator[str]:
+        """Lazily yield the message of each chunk, reading a chunk only when its message is needed."""
+        if self.identical_to is not None:
+            yield f"File `{self.path}` is identical to `{self.identical_to}`."
+            return
+        for chunk in self.chunks:
+            yield chunk.content
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether all chunks of the file are kept, see `leading`."""
+        return all(chunk.total == len(self.chunks) for chunk in self.chunks)
+
+    def leading(self, n_chunks: int) -> Self:
+        """Keep only the first `n_chunks` chunks, e.g. when the rest does not fit in the context."""
+        return replace(self, chunks=self.chunks[:n_chunks])
+
+
+@dataclass
+class AttachResult:
+    attachments: list[Attachment] = field(default_factory=list)
+    binaries: list[str] = field(default_factory=list)
+    errors: dict[str, str] = field(default_factory=dict)
+    skipped: int = 0  # files over the maximum number of files
+
+
+def find_attachments(
+    pattern: str,
+    attached: Mapping[str, str],
+    chunk_tokens: int = DEFAULT_ATTACHMENT_CHUNK_TOKENS,
+    max_files: int = DEFAULT_MAX_ATTACHMENT_FILES,
+) -> AttachResult:
+    """
+    Read the text files matching `pattern` (a file, directory or glob) into chunks.
+    Files whose content digest is already in `attached` (digest to path), or repeated within `pattern`,
+    are only referenced as identical to the first path they were attached from.
+    """
+    result = AttachResult()
+    seen = dict(attached)
+    for path in expand_paths(pattern):
+        if len(result.attachments) >= max_files:
+            result.skipped += 1
+            continue
+        try:
+            stat = path.stat()
+            read = _read_file(str(path), stat.st_mtime_ns, stat.st_size, chunk_tokens)
+        except OSError as e:
+            result.errors[str(path)] = e.strerror or str(e)
+            continue
+        if read is None:
+            result.binaries.append(str(path))
+            continue
+        digest, bounds = read
+        if digest in seen:
+            result.attachments.append(Attachment(path=str(path), digest=digest, identical_to=seen[digest]))
+            continue
+        seen[digest] = str(path)
+        chunks = tuple(
+            Chunk(path=str(path), index=i, total=len(bounds), start=start, end=end)
+            for i, (start, end) in enumerate(bounds)
+        )
+        result.attachments.append(Attachment(path=str(path), digest=digest, chunks=chunks))
+    return result
+
+
+def expand_paths(pattern: str) -> list[Path]:
+    pattern = os.path.expanduser(pattern)
+    root = _literal_root(pattern)
+    paths = []
+    for match in sorted(glob.glob(pattern, recursive=True)):
+        path = Path(match)
+        if _is_ignored(path, root):
+            continue
+        if path.is_dir():
+            paths.extend(_walk_files(path))
+        elif path.is_file():
+            paths.append(path)
+    return list(dict.fromkeys(paths))
+
+
+def _literal_root(pattern: str) -> Path:
+    """The leading part of `pattern` without wildcards, explicitly given paths are never ignored."""
+    parts = []
+    for part in Path(pattern).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path(".")
+
+
+def _is_ignored(path: Path, root: Path) -> bool:
+    try:
+        parts = path.relative_to(root).parts
+    except ValueError:
+        return False
+    return any(part.startswith(".") or part in IGNORED_DIRS for part in parts)
+
+
+def _walk_files(directory: Path) -> Iterator[Path]:
+    for dir_path, dir_names, file_names in os.walk(directory):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith(".") and name not in IGNORED_DIRS)
+        for name in sorted(file_names):
+            if not name.startswith("."):
+                yield Path(dir_path) / name
+
+
+@lru_cache(maxsize=MAX_CACHED_FILES)
+def _read_file(
+    path: str, mtime_ns: int, size: int, chunk_tokens: int
+) -> tuple[str, tuple[tuple[int, int], ...]] | None:
+    """
+    Return the content digest and chunk bounds of a text file, or None if it is binary.
+    Cached by (path, mtime, size, chunk size) so re-attaching an unchanged file does not read it again,
+    the text itself is not cached but only decoded from the chunks that are attached.
+    """
+    if size == 0:
+        return hashlib.sha256().hexdigest(), ((0, 0),)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if b"\x00" in data[:BINARY_SNIFF_BYTES]:
+            return None
+        return hashlib.sha256(data).hexdigest(), tuple(_chunk_bounds(data, chunk_tokens * CHARS_PER_TOKEN))
+
+
+def _chunk_bounds(data: mmap.mmap, chunk_bytes: int) -> Iterator[tuple[int, int]]:
+    """Split into chunks of at most `chunk_bytes`, at line boundaries where possible, never inside a character."""
+    start, size = 0, len(data)
+    while start < size:
+        end = start + chunk_bytes
+        if end < size:
+            newline = data.rfind(b"\n", start, end)
+            if newline > start:
+                end = newline + 1
+            else:
+                # no line break, step back to the start of a utf-8 character
+                while end > start + 1 and data[end] & 0xC0 == 0x80:
+                    end -= 1
+        else:
+            end = size
+        yield start, end
+        start = end
@@ -1,9 +1,12 @@
 import json
+import logging
+import time
 from collections import defaultdict
 from functools import cached_property
 from pathlib import Path
 
 import fsspec
+import litellm
 from litellm import BudgetManager
 from litellm.types.utils import ModelResponse
 from pydantic import BaseModel
@@ -16,9 +19,14 @@ from fire_chat.constants import CONFIG_DIR, PROJECT_NAME
 from fire_chat.ui import console, ConsoleStyle
 
 BUDGET_FILE = CONFIG_DIR / "user_cost.json"
+COST_RECORDS_FILE = CONFIG_DIR / "user_cost_records.jsonl"
 
 Duration = Literal["daily", "weekly", "monthly", "yearly"]
 
+DURATION_DAYS: dict[Duration, int] = {"daily": 1, "weekly": 7, "monthly": 30, "yearly": 365}
+
+logger = logging.getLogger(__name__)
+
 
 class CliBudgetManager(BudgetManager):
     def __init__(self, *args, cost_file_path: str | Path = BUDGET_FILE, **kwargs) -> None:
@@ -83,6 +91,24 @@ class Budget(BaseModel, validate_assignment=True):
     def update_cost(self, completion_obj: ModelResponse | None) -> None:
         self.manager.update_cost(completion_obj=completion_obj, user=self.user)
 
+    def record_cost(self, completion_obj: ModelResponse, path: str | Path = COST_RECORDS_FILE) -> None:
+        """
+        Append the cost of a single request to the records file used by `fire-chat report`.
+        Records are kept whether or not the budget is enforced, and across budget resets.
+        """
+        try:
+            cost = litellm.completion_cost(completion_response=completion_obj)
+        except Exception as e:
+            logger.warning(f"Failed to compute the cost of '{completion_obj.model}': {e}")
+            return
+        record = {"timestamp": time.time(), "user": self.user, "model": completion_obj.model, "cost": cost}
+        try:
+            # a single write per line, so an interrupted write leaves at most one partial line
+            with fsspec.open(path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to record the cost of '{completion_obj.model}' to {path}: {e}")
+
     def display_expense(self) -> None:
         # Create a table for expense information
         table = Table(
@@ -0,0 +1,230 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+
+import litellm
+from prompt_toolkit import PromptSession
+from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.formatted_text import StyleAndTextTuples
+
+from fire_chat.chat import LLMChat
+
+DEBOUNCE_SECONDS = 0.3
+CHUNK_LINES = 32  # average number of lines in a chunk
+MAX_CHUNK_LINES = 4 * CHUNK_LINES
+MIN_CACHED_CHUNKS = 1024
+
+
+@dataclass(frozen=True)
+class Estimate:
+    tokens: int = 0
+    cost: float | None = None
+    max_input_tokens: int | None = None
+    remaining_budget: float | None = None
+
+    @property
+    def exceeds_context(self) -> bool:
+        return self.max_input_tokens is not None and self.tokens > self.max_input_tokens
+
+    @property
+    def exceeds_budget(self) -> bool:
+        return self.remaining_budget is not None and self.cost is not None and self.cost > self.remaining_budget
+
+    @property
+    def is_blocked(self) -> bool:
+        return self.exceeds_context or self.exceeds_budget
+
+
+class PromptEstimator:
+    """
+    Estimate input tokens and cost of the prompt being typed, together with the conversation so far.
+    Estimates are debounced on a single background worker so that typing never waits for the tokenizer,
+    each request is tagged with a generation so that results of outdated requests are dropped.
+    """
+
+    def __init__(self, chat: LLMChat, debounce: float = DEBOUNCE_SECONDS) -> None:
+        self.chat = chat
+        self.debounce = debounce
+        self.estimate = Estimate()
+        self._session: PromptSession | None = None
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._pending: tuple[int, str, float] | None = None  # (generation, text, due time)
+        self._worker: threading.Thread | None = None
+        self._conversation_tokens: tuple[int, int] = (-1, 0)  # (number of messages, tokens)
+
+    def attach(self, session: PromptSession) -> None:
+        """Re-estimate whenever the prompt buffer changes."""
+        self._session = session
+        session.default_buffer.on_text_changed += self._on_text_changed
+
+    def schedule(self, text: str = "") -> None:
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, text, time.monotonic() + self.debounce)
+            self._condition.notify()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="prompt-estimator", daemon=True)
+                self._worker.start()
+
+    def _on_text_changed(self, buffer: Buffer) -> None:
+        self.schedule(buffer.text)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, text, due = self._pending
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    # wait for the debounce delay, a newer request may replace the pending one meanwhile
+                    self._condition.wait(remaining)
+                    continue
+                self._pending = None
+            estimate = self.estimate_prompt(text)
+            with self._condition:
+                if generation != self._generation:
+                    continue
+                self.estimate = estimate
+            if self._session is not None:
+                self._session.app.invalidate()
+
+    def estimate_prompt(self, text: str) -> Estimate:
+        return self._estimate(self._count_conversation_tokens() + count_tokens(self.chat.config.model, text))
+
+    def fit(self, groups: Iterable[Iterable[str]]) -> list[int]:
+        """
+        How many leading messages of each group can be added to the conversation, after those of the groups before
+        it, while still leaving room for a prompt and a response of `Config.max_tokens` in the context and budget.
+        Messages are only counted when needed: a group is not counted past its first message that does not fit,
+        and nothing more is counted once the context or the budget is used up.
+        """
+        model = self.chat.config.model
+        tokens = self._count_conversation_tokens() + self.chat.config.max_tokens
+        fits = []
+        for group in groups:
+            n_messages = 0
+            if not self._estimate(tokens + 1).is_blocked:
+                for content in group:
+                    content_tokens = count_tokens(model, content)
+                    if self._estimate(tokens + content_tokens).is_blocked:
+                        break
+                    tokens += content_tokens
+                    n_messages += 1
+            fits.append(n_messages)
+        return fits
+
+    def _estimate(self, tokens: int) -> Estimate:
+        model = self.chat.config.model
+        budget = self.chat.config.budget
+        return Estimate(
+            tokens=tokens,
+            cost=_prompt_cost(model, tokens),
+            max_input_tokens=_max_input_tokens(model),
+            remaining_budget=budget.remaining_budget if budget.is_on else None,
+        )
+
+    def _count_conversation_tokens(self) -> int:
+        """The conversation only changes between turns, so only count it when messages were added."""
+        n_messages, tokens = self._conversation_tokens
+        if n_messages != len(self.chat.messages):
+            messages = list(self.chat.messages)
+            if "system" not in [message.role for message in messages]:
+                messages.insert(0, self.chat.system_message)
+            tokens = sum(count_tokens(self.chat.config.model, message.content or "") for message in messages)
+            self._conversation_tokens = (len(self.chat.messages), tokens)
+        return tokens
+
+    def toolbar(self) -> StyleAndTextTuples:
+        estimate = self.estimate
+        max_tokens = f"/{estimate.max_input_tokens:,}" if estimate.max_input_tokens is not None else ""
+        parts = [f"input tokens: {estimate.tokens:,}{max_tokens}"]
+        parts.append(f"est. cost: ${estimate.cost:.4f}" if estimate.cost is not None else "est. cost: n/a")
+        if estimate.remaining_budget is not None:
+            parts.append(f"remaining budget: ${estimate.remaining_budget:.4f}")
+        if estimate.exceeds_context:
+            parts.append("exceeds context window!")
+        if estimate.exceeds_budget:
+            parts.append("exceeds budget!")
+        return [("fg:ansired" if estimate.is_blocked else "", " " + " | ".join(parts))]
+
+
+def count_tokens(model: str, text: str) -> int:
+    """Count tokens in chunks of lines, so re-counting an edited prompt only tokenizes the chunks that changed."""
+    chunks = _split_chunks(text)
+    tokens = 0
+    for chunk in chunks:
+        count = _chunk_tokens.get((model, chunk))
+        if count is None:
+            count = litellm.token_counter(model=model, text=chunk)
+            _chunk_tokens.put((model, chunk), count, min_size=2 * len(chunks))
+        tokens += count
+    return tokens
+
+
+def _split_chunks(text: str) -> list[str]:
+    """
+    Split into content-defined chunks of about `CHUNK_LINES` lines: a chunk ends after a line whose hash, together
+    with the line before it, hits a boundary. Boundaries only depend on the nearby lines, so inserting or deleting
+    a line only changes the chunk around it instead of shifting every chunk after it.
+    """
+    chunks, start, previous = [], 0, ""
+    lines = text.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if zlib.crc32((previous + line).encode()) % CHUNK_LINES == 0 or i + 1 - start >= MAX_CHUNK_LINES:
+            chunks.append("".join(lines[start : i + 1]))
+            start = i + 1
+        previous = line
+    if start < len(lines):
+        chunks.append("".join(lines[start:]))
+    return chunks
+
+
+class _ChunkTokenCache:
+    """
+    Least recently used token counts of chunks, shared by the estimator worker and the main thread.
+    It holds at least `MIN_CACHED_CHUNKS` and grows to twice the chunks of the largest text counted,
+    so that both the previous and the current version of a large prompt stay cached.
+    """
+
+    def __init__(self) -> None:
+        self._counts: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._max_size = MIN_CACHED_CHUNKS
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> int | None:
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+            return count
+
+    def put(self, key: tuple[str, str], count: int, min_size: int = 0) -> None:
+        with self._lock:
+            self._max_size = max(self._max_size, min_size)
+            self._counts[key] = count
+            while len(self._counts) > self._max_size:
+                self._counts.popitem(last=False)
+
+
+_chunk_tokens = _ChunkTokenCache()
+
+
+@lru_cache
+def _max_input_tokens(model: str) -> int | None:
+    try:
+        return litellm.get_model_info(model).get("max_input_tokens")
+    except Exception:
+        return None
+
+
+def _prompt_cost(model: str, tokens: int) -> float | None:
+    try:
+        return litellm.cost_per_token(model=model, prompt_tokens=tokens, completion_tokens=0)[0]
+    except Exception:
+        return None
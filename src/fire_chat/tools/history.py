@@ -1,17 +1,28 @@
 import json
 import logging
+from collections import deque
+from collections.abc import Iterable, Iterator
 from datetime import datetime
+from pathlib import Path
 
 import fsspec
+import fsspec.compression
+from fsspec.core import OpenFile, split_protocol
 from pydantic import Field, BaseModel
 from typing_extensions import Self
 
 from fire_chat.config import Model
-from fire_chat.constants import CONFIG_DIR
-from fire_chat.message import Messages
+from fire_chat.constants import CONFIG_DIR, DEFAULT_HISTORY_COMPRESSION, HistoryCompression
+from fire_chat.message import Messages, Message, USER
 from fire_chat.ui import ConsoleStyle, console
 
 HISTORY_DIR = CONFIG_DIR / "session_history"
+HISTORY_CACHE_DIR = CONFIG_DIR / "cache" / "session_history"
+
+HISTORY_FILE_SUFFIX = ".jsonl"
+COMPRESSION_SUFFIXES: dict[HistoryCompression, str] = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+LOCAL_PROTOCOLS = (None, "file", "local")
 
 logger = logging.getLogger(__name__)
 
@@ -21,31 +32,122 @@ class History(BaseModel, validate_default=True):
     messages: Messages = Messages()
     timestamp: datetime = Field(default_factory=datetime.now)
 
-    def save(self, file_name: str | None = None) -> None:
+    def save(self, file_name: str | None = None, compression: HistoryCompression = DEFAULT_HISTORY_COMPRESSION) -> None:
+        """
+        Save history as JSON lines: a header line with the session metadata, followed by one line per message.
+        Compression is inferred from the file name, `compression` only applies to generated file names.
+        """
         try:
-            file_name = file_name or _create_new_history_file_name()
-            file_path = HISTORY_DIR / file_name
-            with fsspec.open(file_path, "w+") as f:
-                f.write(self.model_dump_json())
+            file_path = _resolve_history_path(file_name or _create_new_history_file_name(compression))
+            with _open_history_file(file_path, "wt") as f:
+                f.write(self.model_dump_json(exclude={"messages"}) + "\n")
+                for message in self.messages:
+                    f.write(message.model_dump_json() + "\n")
             console.print(f"History saved to {file_path}.", style=ConsoleStyle.bold_green)
         except Exception as e:
             console.print(f"Failed to save history: {e}", style=ConsoleStyle.bold_red)
 
     @classmethod
-    def load(cls, file_name: str | None = None) -> Self | None:
+    def load(cls, file_name: str | None = None, last_n_turns: int | None = None) -> Self | None:
+        """Load history, optionally keeping only the last `last_n_turns` turns (a turn starts at a user message)."""
         try:
             if not file_name:
                 return None
-            with fsspec.open(HISTORY_DIR / file_name, "r") as f:
-                return History.model_validate(json.load(f))
+            records = _iter_history_records(_resolve_history_path(file_name))
+            header = next(records)
+            messages = _take_last_turns(records, last_n_turns) if last_n_turns else list(records)
+            return cls.model_validate({**header, "messages": messages})
         except Exception as e:
             console.print(f"Failed to load history: {e}", style=ConsoleStyle.bold_red)
             return None
 
+    @classmethod
+    def iter_messages(cls, file_name: str) -> Iterator[Message]:
+        """Lazily yield messages from a history file without loading the whole file."""
+        records = _iter_history_records(_resolve_history_path(file_name))
+        next(records)  # skip header
+        for record in records:
+            yield Message.model_validate(record)
+
+
+def _iter_history_records(file_path: str) -> Iterator[dict]:
+    """
+    Stream a history file, yielding the header (session metadata) first and then each message.
+    Falls back to the legacy format where the whole history is a single JSON document.
+    """
+    with _open_history_file(file_path, "rt") as f:
+        first_line = f.readline()
+        try:
+            header = json.loads(first_line)
+        except json.JSONDecodeError:
+            # legacy pretty printed history
+            header = json.loads(first_line + f.read())
+        legacy_messages = header.pop("messages", None)
+        yield header
+        if legacy_messages is not None:
+            yield from legacy_messages
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _take_last_turns(records: Iterable[dict], n: int) -> list[dict]:
+    """Keep the last `n` turns, holding at most `n` turns in memory while streaming."""
+    turns: deque[list[dict]] = deque(maxlen=n)
+    for record in records:
+        if not turns or record.get("role", USER) == USER:
+            turns.append([])
+        turns[-1].append(record)
+    return [record for turn in turns for record in turn]
+
+
+def _resolve_history_path(file_name: str) -> str:
+    """
+    Urls (e.g. 's3://bucket/history.jsonl.gz' or 'file:///tmp/history.jsonl') and absolute paths are used as is,
+    plain names are relative to HISTORY_DIR.
+    """
+    if "::" in file_name or split_protocol(file_name)[0] is not None or Path(file_name).is_absolute():
+        return file_name
+    return str(HISTORY_DIR / file_name)
+
+
+def _infer_compression(file_path: str) -> str | None:
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if suffix and file_path.endswith(suffix):
+            return compression
+    return None
+
+
+def _open_history_file(file_path: str, mode: str) -> OpenFile:
+    compression = _infer_compression(file_path)
+    if "::" in file_path or split_protocol(file_path)[0] in LOCAL_PROTOCOLS or "r" not in mode:
+        return fsspec.open(file_path, mode, compression=compression)
+    # keep a local copy of remote histories, only re-downloaded when the remote file changes
+    return fsspec.open(
+        f"filecache::{file_path}",
+        mode,
+        compression=compression,
+        filecache={"cache_storage": str(HISTORY_CACHE_DIR), "check_files": True},
+    )
+
 
 def _get_current_timestamp_formatted() -> str:
     return datetime.utcnow().strftime("%Y-%m-%d-%H-%M-%S")
 
 
-def _create_new_history_file_name() -> str:
-    return f"history-{_get_current_timestamp_formatted()}.json"
+def _resolve_compression(compression: HistoryCompression) -> HistoryCompression:
+    """Fall back to gzip if the compression library is not installed, instead of failing when saving."""
+    if compression != "none" and compression not in fsspec.compression.compr:
+        console.print(
+            f"History compression '{compression}' is not available (install 'fire-chat[{compression}]'), "
+            f"falling back to '{DEFAULT_HISTORY_COMPRESSION}'.",
+            style=ConsoleStyle.bold_red,
+        )
+        return DEFAULT_HISTORY_COMPRESSION
+    return compression
+
+
+def _create_new_history_file_name(compression: HistoryCompression = DEFAULT_HISTORY_COMPRESSION) -> str:
+    suffix = COMPRESSION_SUFFIXES[_resolve_compression(compression)]
+    return f"history-{_get_current_timestamp_formatted()}{HISTORY_FILE_SUFFIX}{suffix}"
@@ -0,0 +1,277 @@
+import json
+import logging
+import time
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+import fsspec
+import numpy as np
+from fsspec import AbstractFileSystem
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+from typing_extensions import Self
+
+from fire_chat.tools.budget import COST_RECORDS_FILE, DURATION_DAYS, Budget
+from fire_chat.ui import console, ConsoleStyle
+
+
+class Period(str, Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+PERCENTILES = (50, 90, 99)
+SECONDS_IN_A_DAY = 24 * 60 * 60
+
+SIDECAR_SUFFIX = ".npz"
+SIDECAR_CHECK_BYTES = 64
+SIDECAR_COLUMNS = ("timestamps", "costs", "user_codes", "user_labels", "model_codes", "model_labels")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CostRecords:
+    """Per request cost records stored as columns, users and models are encoded as indices into their labels."""
+
+    timestamps: np.ndarray  # datetime64[s], UTC
+    costs: np.ndarray  # float64, USD
+    user_codes: np.ndarray
+    user_labels: np.ndarray
+    model_codes: np.ndarray
+    model_labels: np.ndarray
+
+    @classmethod
+    def load(cls, path: str | Path = COST_RECORDS_FILE) -> Self:
+        """
+        Load the records file into columns. The columns parsed so far are kept in a numpy sidecar next to it
+        (`<path>.npz`) with the number of bytes they cover, so only the records appended since are parsed.
+        """
+        fs, file_path = fsspec.core.url_to_fs(str(path))
+        if not fs.exists(file_path):
+            return cls.from_records([])
+        sidecar_path = file_path + SIDECAR_SUFFIX
+        records, offset, check = _load_sidecar(fs, sidecar_path)
+        with fs.open(file_path, "rb") as f:
+            # the bytes before the offset must be unchanged, otherwise the file was rewritten and is parsed again
+            f.seek(max(offset - len(check), 0))
+            if offset > fs.size(file_path) or f.read(len(check)) != check:
+                records, offset, check = cls.from_records([]), 0, b""
+                f.seek(0)
+            data = f.read()
+        # only complete lines are cached, a partially written last line is parsed again next time
+        end = data.rfind(b"\n") + 1
+        if end:
+            records = records.concat(cls.from_records(_parse_records(data[:end])))
+            _save_sidecar(fs, sidecar_path, records, offset + end, (check + data[:end])[-SIDECAR_CHECK_BYTES:])
+        if data[end:].strip():
+            records = records.concat(cls.from_records(_parse_records(data[end:])))
+        return records
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> Self:
+        timestamps = np.fromiter((record["timestamp"] for record in records), dtype=np.float64, count=len(records))
+        costs = np.fromiter((record["cost"] for record in records), dtype=np.float64, count=len(records))
+        user_labels, user_codes = np.unique(
+            np.array([record["user"] for record in records], dtype=str), return_inverse=True
+        )
+        model_labels, model_codes = np.unique(
+            np.array([record["model"] for record in records], dtype=str), return_inverse=True
+        )
+        return cls(
+            timestamps=timestamps.astype(np.int64).astype("datetime64[s]"),
+            costs=costs,
+            user_codes=user_codes,
+            user_labels=user_labels,
+            model_codes=model_codes,
+            model_labels=model_labels,
+        )
+
+    def __len__(self) -> int:
+        return len(self.costs)
+
+    def filter(self, mask: np.ndarray) -> Self:
+        return CostRecords(
+            timestamps=self.timestamps[mask],
+            costs=self.costs[mask],
+            user_codes=self.user_codes[mask],
+            user_labels=self.user_labels,
+            model_codes=self.model_codes[mask],
+            model_labels=self.model_labels,
+        )
+
+    def concat(self, other: Self) -> Self:
+        user_labels, user_codes = _merge_codes(self.user_labels, self.user_codes, other.user_labels, other.user_codes)
+        model_labels, model_codes = _merge_codes(
+            self.model_labels, self.model_codes, other.model_labels, other.model_codes
+        )
+        return CostRecords(
+            timestamps=np.concatenate([self.timestamps, other.timestamps]),
+            costs=np.concatenate([self.costs, other.costs]),
+            user_codes=user_codes,
+            user_labels=user_labels,
+            model_codes=model_codes,
+            model_labels=model_labels,
+        )
+
+    def filter_user(self, user: str) -> Self:
+        return self.filter(np.isin(self.user_codes, np.flatnonzero(self.user_labels == user)))
+
+    def since(self, start: np.datetime64) -> Self:
+        return self.filter(self.timestamps >= start)
+
+    def by_user(self) -> dict[str, float]:
+        return _sum_by_code(self.user_labels, self.user_codes, self.costs)
+
+    def by_model(self) -> dict[str, float]:
+        return _sum_by_code(self.model_labels, self.model_codes, self.costs)
+
+    def by_period(self, period: Period) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return period start dates, total cost and number of requests of each period with any spend."""
+        labels, codes = np.unique(_truncate(self.timestamps, period), return_inverse=True)
+        return labels, np.bincount(codes, weights=self.costs, minlength=len(labels)), np.bincount(codes)
+
+    def percentiles(self, q: tuple[int, ...] = PERCENTILES) -> np.ndarray:
+        if not len(self):
+            return np.zeros(len(q))
+        return np.percentile(self.costs, q)
+
+
+def _parse_records(data: bytes) -> list[dict]:
+    lines = [line for line in data.decode("utf-8", errors="replace").splitlines() if line.strip()]
+    try:
+        # parsing all lines as a single array is much faster than parsing them one by one
+        records = json.loads("[" + ",".join(lines) + "]")
+        if all(_is_valid_record(record) for record in records):
+            return records
+    except json.JSONDecodeError:
+        pass
+    # some lines are invalid (e.g. a partially written last line), parse line by line and skip them
+    records = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if _is_valid_record(record):
+            records.append(record)
+    console.print(
+        f"Skipped {len(lines) - len(records)} invalid cost record(s).",
+        style=ConsoleStyle.bold_red,
+    )
+    return records
+
+
+def _is_valid_record(record: dict) -> bool:
+    return isinstance(record, dict) and {"timestamp", "user", "model", "cost"} <= record.keys()
+
+
+def _merge_codes(
+    labels: np.ndarray, codes: np.ndarray, other_labels: np.ndarray, other_codes: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Concatenate two encoded columns, re-encoding both against the union of their labels."""
+    merged_labels, inverse = np.unique(np.concatenate([labels, other_labels]), return_inverse=True)
+    return merged_labels, np.concatenate([inverse[: len(labels)][codes], inverse[len(labels) :][other_codes]])
+
+
+def _load_sidecar(fs: AbstractFileSystem, path: str) -> tuple[CostRecords, int, bytes]:
+    """Return the cached records, the number of bytes of the records file they cover and the last of those bytes."""
+    try:
+        with fs.open(path, "rb") as f, np.load(f) as sidecar:
+            records = CostRecords(**{name: sidecar[name] for name in SIDECAR_COLUMNS})
+            return records, int(sidecar["offset"]), sidecar["check"].tobytes()
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring invalid cost records cache {path}: {e}")
+    return CostRecords.from_records([]), 0, b""
+
+
+def _save_sidecar(fs: AbstractFileSystem, path: str, records: CostRecords, offset: int, check: bytes) -> None:
+    try:
+        # write to a temporary file first, so a concurrent load never reads a partially written cache
+        with fs.open(path + ".tmp", "wb") as f:
+            columns = {name: getattr(records, name) for name in SIDECAR_COLUMNS}
+            np.savez(f, offset=offset, check=np.frombuffer(check, dtype=np.uint8), **columns)
+        fs.mv(path + ".tmp", path)
+    except OSError as e:
+        logger.warning(f"Failed to cache cost records to {path}: {e}")
+
+
+def _sum_by_code(labels: np.ndarray, codes: np.ndarray, costs: np.ndarray) -> dict[str, float]:
+    totals = np.bincount(codes, weights=costs, minlength=len(labels))
+    order = np.argsort(totals)[::-1]
+    return {str(labels[i]): float(totals[i]) for i in order if totals[i] > 0}
+
+
+def _truncate(timestamps: np.ndarray, period: Period) -> np.ndarray:
+    days = timestamps.astype("datetime64[D]")
+    if period == Period.day:
+        return days
+    if period == Period.week:
+        # numpy weeks start on Thursday (1970-01-01), shift them to start on Monday
+        return (days + 3).astype("datetime64[W]").astype("datetime64[D]") - 3
+    if period == Period.month:
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"Invalid period '{period}', must be one of {', '.join(p.value for p in Period)}")
+
+
+def display_report(records: CostRecords, budget: Budget, period: Period = Period.day, last: int = 14) -> None:
+    if not len(records):
+        console.print("No cost records found.", style=ConsoleStyle.bold_yellow)
+        return
+
+    console.print(_create_panel("Spend by user", _create_table(records.by_user())))
+    console.print(_create_panel("Spend by model", _create_table(records.by_model())))
+
+    period = Period(period)
+    labels, totals, counts = records.by_period(period)
+    table = _create_table({}, "Requests")
+    for label, total, count in zip(labels[-last:], totals[-last:], counts[-last:]):
+        table.add_row(Text(str(label), style=ConsoleStyle.bold_yellow), f"{total:.3f}", str(count))
+    console.print(_create_panel(f"Spend by {period.value} (last {last})", table))
+
+    percentiles = {f"p{q}": float(value) for q, value in zip(PERCENTILES, records.percentiles())}
+    table = _create_table({"Mean": float(records.costs.mean()), **percentiles}, precision=4)
+    console.print(_create_panel("Cost per request", table))
+
+    console.print(_create_panel("Budget projection", _create_projection_table(records, budget)))
+
+
+def _create_projection_table(records: CostRecords, budget: Budget, now: float | None = None) -> Table:
+    """Project the spend of a budget duration from the average daily spend within the last duration."""
+    duration_days = DURATION_DAYS[budget.duration]
+    now = np.datetime64(int(now if now is not None else time.time()), "s")
+    window = records.since(now - np.timedelta64(duration_days * SECONDS_IN_A_DAY, "s"))
+    spent = float(window.costs.sum())
+    elapsed_days = (now - records.timestamps.min()) / np.timedelta64(1, "D")
+    daily_spend = spent / min(max(elapsed_days, 1.0), duration_days)
+    projected = daily_spend * duration_days
+    rows = {
+        f"Spent in the last {duration_days} day(s)": spent,
+        "Average daily spend": daily_spend,
+        f"Projected {budget.duration} spend": projected,
+        "Budget": budget.amount,
+        "Projected remaining budget": budget.amount - projected,
+    }
+    return _create_table(rows)
+
+
+def _create_table(rows: dict[str, float], *extra_columns: str, precision: int = 3) -> Table:
+    table = Table(
+        show_header=True, expand=True, border_style=ConsoleStyle.bold_blue, header_style=ConsoleStyle.bold_blue
+    )
+    table.add_column("Item", style=ConsoleStyle.bold_green)
+    table.add_column("Value (USD)", style=ConsoleStyle.bold_purple, justify="right")
+    for column in extra_columns:
+        table.add_column(column, style=ConsoleStyle.bold_purple, justify="right")
+    for name, value in rows.items():
+        table.add_row(Text(name, style=ConsoleStyle.bold_yellow), f"{value:.{precision}f}")
+    return table
+
+
+def _create_panel(title: str, table: Table) -> Panel:
+    return Panel(table, title=title, expand=False, border_style=ConsoleStyle.bold_blue, title_align="left")
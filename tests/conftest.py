@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# keep tests away from the user's config directory and litellm from fetching the remote cost map
+os.environ["HOME"] = tempfile.mkdtemp(prefix="fire-chat-test-home-")
+os.environ["LITELLM_LOCAL_MODEL_COST_MAP"] = "True"
@@ -0,0 +1,172 @@
+import pytest
+
+from fire_chat.chat import LLMChat
+from fire_chat.config import Config
+from fire_chat.constants import DEFAULT_ATTACHMENT_CHUNK_TOKENS
+from fire_chat.main import process_attach
+from fire_chat.tools import attachment as attachment_module
+from fire_chat.tools.attachment import expand_paths, find_attachments
+from fire_chat.tools.estimate import PromptEstimator
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("same content\n")
+    (tmp_path / "sub" / "b.txt").write_text("same content\n")
+    (tmp_path / "c.py").write_text("print('c')\n")
+    (tmp_path / "binary.dat").write_bytes(b"\x00\x01\x02")
+    for ignored in [".git", ".venv", "node_modules", "__pycache__"]:
+        (tmp_path / ignored).mkdir()
+        (tmp_path / ignored / "ignored.txt").write_text(ignored)
+    (tmp_path / ".env").write_text("SECRET=1\n")
+    return tmp_path
+
+
+def _paths(result, root) -> list[str]:
+    return [str(attachment.path).removeprefix(f"{root}/") for attachment in result.attachments]
+
+
+def test_expand_paths_skips_hidden_and_vendored_directories(tree):
+    expected = ["a.txt", "binary.dat", "c.py", "sub/b.txt"]
+    assert [str(p.relative_to(tree)) for p in expand_paths(str(tree))] == expected
+    assert [str(p.relative_to(tree)) for p in expand_paths(f"{tree}/**/*.txt")] == ["a.txt", "sub/b.txt"]
+    # explicitly given paths are not ignored
+    assert expand_paths(str(tree / ".git" / "ignored.txt")) == [tree / ".git" / "ignored.txt"]
+    assert expand_paths(str(tree / ".git")) == [tree / ".git" / "ignored.txt"]
+
+
+def test_identical_files_are_referenced(tree):
+    result = find_attachments(str(tree), {})
+    assert _paths(result, tree) == ["a.txt", "c.py", "sub/b.txt"]
+    assert result.binaries == [str(tree / "binary.dat")]
+    identical = result.attachments[2]
+    assert identical.identical_to == str(tree / "a.txt")
+    assert identical.contents == [f"File `{tree / 'sub' / 'b.txt'}` is identical to `{tree / 'a.txt'}`."]
+
+    # files attached before are referenced as well
+    attached = {attachment.digest: attachment.path for attachment in result.attachments[:1]}
+    again = find_attachments(str(tree / "sub"), attached)
+    assert again.attachments[0].identical_to == str(tree / "a.txt")
+
+
+def test_repeated_content_within_a_file_is_kept(tmp_path):
+    path = tmp_path / "repetitive.log"
+    path.write_text("the same line over and over\n" * 50_000)
+    [attachment] = find_attachments(str(path), {}, chunk_tokens=1000).attachments
+    assert len(attachment.chunks) > 1
+    assert len(attachment.contents) == len(attachment.chunks)
+    assert "".join(chunk.text for chunk in attachment.chunks) == path.read_text()
+
+
+def test_chunks_split_at_lines_and_characters(tmp_path):
+    lines = tmp_path / "lines.txt"
+    lines.write_text("".join(f"{i:03d}\n" for i in range(100)))
+    [attachment] = find_attachments(str(lines), {}, chunk_tokens=5).attachments
+    assert all(chunk.text.endswith("\n") for chunk in attachment.chunks)
+    assert all(len(chunk.text.encode()) <= 20 for chunk in attachment.chunks)
+
+    unicode = tmp_path / "unicode.txt"
+    unicode.write_text("é" * 100)
+    [attachment] = find_attachments(str(unicode), {}, chunk_tokens=1).attachments
+    assert "".join(chunk.text for chunk in attachment.chunks) == "é" * 100
+
+
+def test_chunk_bounds_are_cached_by_chunk_size(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1000)))
+    [small] = find_attachments(str(path), {}, chunk_tokens=100).attachments
+    [large] = find_attachments(str(path), {}, chunk_tokens=10_000).attachments
+    assert len(small.chunks) > len(large.chunks) == 1
+
+    hits = attachment_module._read_file.cache_info().hits
+    assert find_attachments(str(path), {}, chunk_tokens=100).attachments[0].chunks == small.chunks
+    assert attachment_module._read_file.cache_info().hits == hits + 1
+
+
+def test_chunks_are_decoded_lazily(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1000)))
+    [attachment] = find_attachments(str(path), {}, chunk_tokens=100).attachments
+    assert not any("text" in vars(chunk) for chunk in attachment.chunks)
+    assert next(attachment.iter_contents()).startswith(f"File `{path}` (part 1/")
+    assert ["text" in vars(chunk) for chunk in attachment.chunks[:2]] == [True, False]
+
+
+def test_read_errors_are_reported(tree, monkeypatch):
+    read_file = attachment_module._read_file
+
+    def failing_read_file(path, *args):
+        if path.endswith("c.py"):
+            raise PermissionError(13, "Permission denied")
+        return read_file(path, *args)
+
+    monkeypatch.setattr(attachment_module, "_read_file", failing_read_file)
+    result = find_attachments(str(tree), {})
+    assert result.errors == {str(tree / "c.py"): "Permission denied"}
+    assert _paths(result, tree) == ["a.txt", "sub/b.txt"]
+
+
+def test_max_files(tree):
+    result = find_attachments(str(tree), {}, max_files=1)
+    assert _paths(result, tree) == ["a.txt"]
+    assert result.skipped == 3  # the binary file is over the maximum too
+
+
+def test_add_attachments_within_context(tree, monkeypatch):
+    chat = LLMChat(config=Config())
+    estimator = PromptEstimator(chat)
+    result = chat.find_attachments(str(tree))
+    assert estimator.fit(attachment.iter_contents() for attachment in result.attachments) == [1, 1, 1]
+
+    chat.add_attachments(result.attachments)
+    assert len(chat.messages) == 3
+    assert chat.find_attachments(str(tree / "c.py")).attachments[0].identical_to == str(tree / "c.py")
+
+    # attachments that would overflow the context window are not added
+    limit = estimator.estimate_prompt("").tokens + chat.config.max_tokens + 20
+    monkeypatch.setattr("fire_chat.tools.estimate._max_input_tokens", lambda model: limit)
+    assert estimator.fit([["short"], ["long " * 100], ["short"]]) == [1, 0, 1]
+    assert estimator.fit([["short", "long " * 100, "short"], ["short"]]) == [1, 1]
+
+
+def test_fit_stops_counting_once_the_context_is_used_up(tmp_path, monkeypatch):
+    path = tmp_path / "large.txt"
+    path.write_text("".join(f"line {i} of a large file\n" for i in range(10_000)))
+    [attachment] = find_attachments(str(path), {}, chunk_tokens=100).attachments
+
+    chat = LLMChat(config=Config())
+    estimator = PromptEstimator(chat)
+    limit = estimator.estimate_prompt("").tokens + chat.config.max_tokens + 500
+    monkeypatch.setattr("fire_chat.tools.estimate._max_input_tokens", lambda model: limit)
+    [n_chunks] = estimator.fit([attachment.iter_contents()])
+    assert 0 < n_chunks < len(attachment.chunks)
+    # only the chunks that fit and the first one that does not are decoded and counted
+    assert sum("text" in vars(chunk) for chunk in attachment.chunks) == n_chunks + 1
+
+    counted = []
+    monkeypatch.setattr("fire_chat.tools.estimate.count_tokens", lambda model, text: counted.append(text) or 100)
+    assert estimator.fit([["a"] * 10, ["b"], ["c"]]) == [5, 0, 0]
+    assert counted == ["a"] * 6
+
+
+def test_process_attach_attaches_leading_chunks(tmp_path, monkeypatch, capsys):
+    large = tmp_path / "large.txt"
+    large.write_text("".join(f"line {i} of a large file\n" for i in range(10_000)))
+    (tmp_path / "same.txt").write_text(large.read_text())
+
+    chat = LLMChat(config=Config())
+    estimator = PromptEstimator(chat)
+    limit = estimator.estimate_prompt("").tokens + chat.config.max_tokens + 3 * DEFAULT_ATTACHMENT_CHUNK_TOKENS
+    monkeypatch.setattr("fire_chat.tools.estimate._max_input_tokens", lambda model: limit)
+    process_attach(chat, estimator, str(tmp_path))
+
+    n_messages = len(chat.messages)
+    assert 1 < n_messages
+    assert chat.messages[-1].content == f"File `{tmp_path / 'same.txt'}` is identical to `{large}`."
+    output = " ".join(capsys.readouterr().out.split())
+    # the identical file reference counts as a message too
+    assert f"Attached 1 file(s) as {n_messages} message(s), 1 identical to other attached files" in output
+    assert "Left out " in output and f"{large} (" in output
+    # only completely attached files are referenced when attached again
+    assert chat.find_attachments(str(large)).attachments[0].identical_to is None
@@ -0,0 +1,14 @@
+import fsspec.compression
+
+from fire_chat.config import HistoryConf
+
+
+def test_unavailable_history_compression_is_kept_in_config(monkeypatch):
+    # the fallback is resolved when saving history, so it is never written back to the config file
+    monkeypatch.delitem(fsspec.compression.compr, "zstd", raising=False)
+    assert HistoryConf(compression="zstd").compression == "zstd"
+
+    conf = HistoryConf()
+    conf.compression = "zstd"
+    assert conf.compression == "zstd"
+    assert HistoryConf(compression="none").compression == "none"
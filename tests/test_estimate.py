@@ -0,0 +1,115 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from fire_chat.chat import LLMChat
+from fire_chat.config import Config
+from fire_chat.tools.budget import Budget
+from fire_chat.tools.estimate import CHUNK_LINES, Estimate, PromptEstimator, _split_chunks, count_tokens
+
+
+@pytest.fixture
+def estimator() -> PromptEstimator:
+    return PromptEstimator(LLMChat(config=Config()), debounce=0.05)
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_count_tokens_in_chunks():
+    text = "".join(f"line {i}\n" for i in range(CHUNK_LINES * 3 + 1))
+    assert count_tokens("gpt-4o", "") == 0
+    assert count_tokens("gpt-4o", text) > count_tokens("gpt-4o", text[: len(text) // 2]) > 0
+
+
+def test_edit_in_large_prompt_only_recounts_nearby_chunks(monkeypatch):
+    counted = []
+
+    def token_counter(model: str, text: str) -> int:
+        counted.append(text)
+        return len(text.split())
+
+    monkeypatch.setattr("litellm.token_counter", token_counter)
+    # more lines than the previous fixed size cache could hold
+    lines = [f"line {i} of a large prompt\n" for i in range(50_000)]
+    model = "edit-test-model"
+    assert count_tokens(model, "".join(lines)) == 6 * len(lines)
+    assert len(counted) == len(_split_chunks("".join(lines)))
+
+    for edit in [
+        lines[:20_000] + ["an inserted line\n"] + lines[20_000:],
+        lines[:100] + lines[101:],
+        lines[:30_000] + ["an edited line\n"] + lines[30_001:],
+    ]:
+        counted.clear()
+        assert count_tokens(model, "".join(edit)) == sum(len(line.split()) for line in edit)
+        # only the chunks around the edit are counted again
+        assert 1 <= len(counted) <= 3
+
+
+def test_split_chunks():
+    text = "".join(f"line {i}\n" for i in range(CHUNK_LINES * 100)) + "no line break"
+    chunks = _split_chunks(text)
+    assert "".join(chunks) == text
+    assert 10 < len(chunks) < 1000
+    assert _split_chunks("") == []
+
+
+def test_estimate_blocks():
+    assert Estimate(tokens=11, max_input_tokens=10).is_blocked
+    assert Estimate(tokens=1, cost=0.2, remaining_budget=0.1).is_blocked
+    assert not Estimate(tokens=1, cost=0.2, max_input_tokens=10).is_blocked
+
+
+def test_estimate_prompt_includes_conversation(estimator):
+    empty = estimator.estimate_prompt("")
+    assert empty.tokens > 0  # the system prompt
+    assert empty.max_input_tokens is not None
+    assert estimator.estimate_prompt("hello world").tokens > empty.tokens
+
+
+def test_estimate_prompt_checks_budget():
+    config = Config(budget=Budget(enabled=True, amount=0.0, user="estimate-test"))
+    estimate = PromptEstimator(LLMChat(config=config)).estimate_prompt("hello " * 1000)
+    assert estimate.remaining_budget is not None
+    assert estimate.exceeds_budget
+
+
+def test_schedule_debounces_to_latest_text(estimator, monkeypatch):
+    estimated = []
+    original = estimator.estimate_prompt
+    monkeypatch.setattr(estimator, "estimate_prompt", lambda text: estimated.append(text) or original(text))
+    for text in ["h", "he", "hel", "hello"]:
+        estimator.schedule(text)
+    _wait_for(lambda: estimated)
+    time.sleep(0.1)
+    assert estimated == ["hello"]
+    assert estimator.estimate == original("hello")
+
+
+def test_outdated_estimates_are_dropped(estimator, monkeypatch):
+    slow_started, release = threading.Event(), threading.Event()
+    shown = []
+
+    def estimate_prompt(text: str) -> Estimate:
+        if text == "slow":
+            slow_started.set()
+            release.wait()
+        return Estimate(tokens=len(text))
+
+    monkeypatch.setattr(estimator, "estimate_prompt", estimate_prompt)
+    # record every estimate the toolbar is redrawn with
+    estimator._session = SimpleNamespace(app=SimpleNamespace(invalidate=lambda: shown.append(estimator.estimate)))
+    estimator.schedule("slow")
+    assert slow_started.wait(5)
+    estimator.schedule("new")  # a new prompt starts while the old estimate is still running
+    release.set()
+    _wait_for(lambda: shown)
+    time.sleep(0.1)
+    assert shown == [Estimate(tokens=3)]
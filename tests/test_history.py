@@ -0,0 +1,130 @@
+import gzip
+import uuid
+
+import fsspec
+import fsspec.compression
+import pytest
+
+from fire_chat.message import Message, Messages
+from fire_chat.tools import history as history_module
+from fire_chat.tools.history import History
+
+
+@pytest.fixture
+def history() -> History:
+    messages = [Message(role="system", content="system")]
+    for i in range(5):
+        messages += [Message(role="user", content=f"q{i}"), Message(role="assistant", content=f"a{i}")]
+    return History(model="gpt-4o", messages=Messages(messages))
+
+
+@pytest.fixture
+def memory_url() -> str:
+    return f"memory://fire-chat-test/{uuid.uuid4().hex}/history.jsonl.gz"
+
+
+def _contents(history: History | None) -> list[str]:
+    assert history is not None
+    return [message.content for message in history.messages]
+
+
+def test_gzip_round_trip(tmp_path, history):
+    path = str(tmp_path / "history.jsonl.gz")
+    history.save(path)
+
+    with gzip.open(path, "rt") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1 + len(history.messages)
+
+    loaded = History.load(path)
+    assert loaded.model == history.model
+    assert loaded.timestamp == history.timestamp
+    assert _contents(loaded) == _contents(history)
+
+
+def test_round_trip_memory_filesystem(memory_url, history):
+    history.save(memory_url)
+    assert _contents(History.load(memory_url)) == _contents(history)
+
+
+@pytest.mark.parametrize(
+    "last_n_turns, expected",
+    [
+        (1, ["q4", "a4"]),
+        (2, ["q3", "a3", "q4", "a4"]),
+        (10, ["system"] + [content for i in range(5) for content in (f"q{i}", f"a{i}")]),
+    ],
+)
+def test_load_last_n_turns(tmp_path, history, last_n_turns, expected):
+    path = str(tmp_path / "history.jsonl")
+    history.save(path)
+    assert _contents(History.load(path, last_n_turns=last_n_turns)) == expected
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_load_legacy_format(tmp_path, history, indent):
+    path = tmp_path / "legacy.json"
+    path.write_text(history.model_dump_json(indent=indent))
+
+    assert _contents(History.load(str(path))) == _contents(history)
+    assert _contents(History.load(str(path), last_n_turns=1)) == ["q4", "a4"]
+    assert [message.content for message in History.iter_messages(str(path))] == _contents(history)
+
+
+def test_iter_messages_is_lazy(memory_url, history):
+    history.save(memory_url)
+    messages = History.iter_messages(memory_url)
+    assert next(messages) == history.messages[0]
+    assert [message.content for message in messages] == _contents(history)[1:]
+
+
+def test_remote_history_is_read_through_filecache(tmp_path, monkeypatch, memory_url, history):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(history_module, "HISTORY_CACHE_DIR", cache_dir)
+    history.save(memory_url)
+
+    assert _contents(History.load(memory_url)) == _contents(history)
+    assert any(cache_dir.iterdir())
+
+    # the cached copy is refreshed when the remote file changes
+    history.messages.append(Message(role="user", content="q5"))
+    history.save(memory_url)
+    assert _contents(History.load(memory_url))[-1] == "q5"
+
+
+def test_local_history_is_not_cached(tmp_path, monkeypatch, history):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(history_module, "HISTORY_CACHE_DIR", cache_dir)
+    history.save(str(tmp_path / "history.jsonl"))
+    History.load(str(tmp_path / "history.jsonl"))
+    assert not cache_dir.exists()
+
+
+def test_memory_filesystem_is_written_compressed(memory_url, history):
+    history.save(memory_url)
+    with fsspec.open(memory_url, "rb") as f:
+        assert f.read(2) == b"\x1f\x8b"  # gzip magic number
+
+
+def test_file_url_is_not_joined_onto_history_dir(tmp_path, history):
+    url = (tmp_path / "history.jsonl.gz").as_uri()
+    assert history_module._resolve_history_path(url) == url
+
+    history.save(url)
+    with gzip.open(tmp_path / "history.jsonl.gz", "rt") as f:
+        assert len(f.read().splitlines()) == 1 + len(history.messages)
+    assert _contents(History.load(url)) == _contents(history)
+
+
+def test_relative_names_are_joined_onto_history_dir(tmp_path):
+    assert history_module._resolve_history_path("history.jsonl") == str(history_module.HISTORY_DIR / "history.jsonl")
+    assert history_module._resolve_history_path(str(tmp_path / "h.jsonl")) == str(tmp_path / "h.jsonl")
+
+
+def test_unavailable_compression_falls_back_to_gzip_when_saving(monkeypatch):
+    monkeypatch.delitem(fsspec.compression.compr, "zstd", raising=False)
+    assert history_module._create_new_history_file_name("zstd").endswith(".jsonl.gz")
+
+    monkeypatch.setitem(fsspec.compression.compr, "zstd", object())
+    assert history_module._create_new_history_file_name("zstd").endswith(".jsonl.zst")
+    assert history_module._create_new_history_file_name("none").endswith(".jsonl")
@@ -0,0 +1,188 @@
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from litellm.types.utils import ModelResponse, Usage
+
+from fire_chat.tools.budget import Budget
+from fire_chat.tools import report
+from fire_chat.tools.report import CostRecords, Period, _create_projection_table, _truncate
+
+
+def _timestamp(day: str) -> float:
+    return datetime.fromisoformat(day).replace(tzinfo=timezone.utc).timestamp()
+
+
+RECORDS = [
+    # 2024-01-01 is a Monday
+    {"timestamp": _timestamp("2024-01-01T10:00:00"), "user": "alice", "model": "gpt-4o", "cost": 1.0},
+    {"timestamp": _timestamp("2024-01-01T23:59:59"), "user": "bob", "model": "gpt-4o", "cost": 2.0},
+    {"timestamp": _timestamp("2024-01-07T12:00:00"), "user": "alice", "model": "claude", "cost": 3.0},
+    {"timestamp": _timestamp("2024-01-08T00:00:00"), "user": "alice", "model": "gpt-4o", "cost": 4.0},
+    {"timestamp": _timestamp("2024-02-01T00:00:00"), "user": "bob", "model": "claude", "cost": 5.0},
+]
+
+
+@pytest.fixture
+def records_path(tmp_path):
+    path = tmp_path / "user_cost_records.jsonl"
+    path.write_text("".join(json.dumps(record) + "\n" for record in RECORDS))
+    return path
+
+
+def _dates(labels: np.ndarray) -> list[str]:
+    return [str(label) for label in labels]
+
+
+def test_load(records_path):
+    records = CostRecords.load(records_path)
+    assert len(records) == len(RECORDS)
+    assert records.costs.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert list(records.by_user()) == ["alice", "bob"]
+    assert records.by_model() == {"gpt-4o": 7.0, "claude": 8.0}
+    assert records.filter_user("bob").costs.tolist() == [2.0, 5.0]
+    assert len(records.filter_user("nobody")) == 0
+
+
+def test_load_missing_file(tmp_path):
+    assert len(CostRecords.load(tmp_path / "missing.jsonl")) == 0
+
+
+def test_load_skips_blank_and_invalid_lines(records_path):
+    with open(records_path, "a") as f:
+        f.write('\n{"timestamp": 1, "user": "alice"}\n\n{"timestamp": 1704067200, "user": "ali')
+    records = CostRecords.load(records_path)
+    assert records.costs.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+@pytest.mark.parametrize(
+    "period, expected_labels, expected_totals, expected_counts",
+    [
+        (Period.day, ["2024-01-01", "2024-01-07", "2024-01-08", "2024-02-01"], [3.0, 3.0, 4.0, 5.0], [2, 1, 1, 1]),
+        (Period.week, ["2024-01-01", "2024-01-08", "2024-01-29"], [6.0, 4.0, 5.0], [3, 1, 1]),
+        (Period.month, ["2024-01-01", "2024-02-01"], [10.0, 5.0], [4, 1]),
+    ],
+)
+def test_by_period(records_path, period, expected_labels, expected_totals, expected_counts):
+    labels, totals, counts = CostRecords.load(records_path).by_period(period)
+    assert _dates(labels) == expected_labels
+    assert totals.tolist() == expected_totals
+    assert counts.tolist() == expected_counts
+
+
+def test_weeks_start_on_monday():
+    days = np.arange("2024-01-01", "2024-01-15", dtype="datetime64[D]").astype("datetime64[s]")
+    weeks = _truncate(days, Period.week)
+    assert _dates(weeks) == ["2024-01-01"] * 7 + ["2024-01-08"] * 7
+    assert all(week.astype(datetime).weekday() == 0 for week in weeks)
+
+
+def test_percentiles(records_path):
+    assert CostRecords.load(records_path).percentiles((0, 50, 100)).tolist() == [1.0, 3.0, 5.0]
+
+
+def test_projection(records_path):
+    budget = Budget(amount=20.0, duration="monthly")
+    table = _create_projection_table(CostRecords.load(records_path), budget, now=_timestamp("2024-02-01T00:00:00"))
+    values = [float(cell) for cell in table.columns[1].cells]
+    # spent since 2024-01-02: 3.0 + 4.0 + 5.0, averaged over 30 days as the records span more than a month
+    assert values == pytest.approx([12.0, 0.4, 12.0, 20.0, 8.0], abs=1e-3)
+
+
+def test_record_cost(tmp_path, monkeypatch):
+    monkeypatch.setattr("litellm.completion_cost", lambda completion_response: 0.5)
+    path = tmp_path / "user_cost_records.jsonl"
+    budget = Budget(user="alice")
+    response = ModelResponse(model="gpt-4o", usage=Usage(prompt_tokens=1, completion_tokens=1, total_tokens=2))
+    budget.record_cost(response, path=path)
+    budget.record_cost(response, path=path)
+
+    records = CostRecords.load(path)
+    assert records.costs.tolist() == [0.5, 0.5]
+    assert records.by_user() == {"alice": 1.0}
+
+
+def test_record_cost_io_error_is_logged(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr("litellm.completion_cost", lambda completion_response: 0.5)
+    response = ModelResponse(model="gpt-4o", usage=Usage(prompt_tokens=1, completion_tokens=1, total_tokens=2))
+    with caplog.at_level(logging.WARNING):
+        Budget(user="alice").record_cost(response, path=tmp_path)  # a directory can not be appended to
+    assert "Failed to record the cost of 'gpt-4o'" in caplog.text
+
+
+def _count_parsed_records(monkeypatch) -> list[int]:
+    parsed = []
+    parse_records = report._parse_records
+
+    def counting_parse_records(data: bytes) -> list[dict]:
+        records = parse_records(data)
+        parsed.append(len(records))
+        return records
+
+    monkeypatch.setattr(report, "_parse_records", counting_parse_records)
+    return parsed
+
+
+def test_load_only_parses_appended_records(records_path, monkeypatch):
+    assert len(CostRecords.load(records_path)) == len(RECORDS)
+    assert (records_path.parent / (records_path.name + ".npz")).exists()
+
+    parsed = _count_parsed_records(monkeypatch)
+    with open(records_path, "a") as f:
+        f.write(
+            json.dumps({"timestamp": _timestamp("2024-02-02T00:00:00"), "user": "carol", "model": "o1", "cost": 6.0})
+        )
+    records = CostRecords.load(records_path)
+    assert parsed == [1]
+    assert records.costs.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    assert records.by_user() == {"alice": 8.0, "carol": 6.0, "bob": 7.0}
+    assert records.by_model() == {"gpt-4o": 7.0, "claude": 8.0, "o1": 6.0}
+
+    # the last line had no line break yet, so it is parsed again once completed
+    with open(records_path, "a") as f:
+        f.write("\n")
+    assert CostRecords.load(records_path).costs.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    assert parsed == [1, 1]
+    assert len(CostRecords.load(records_path)) == 6
+    assert parsed == [1, 1]
+
+
+def test_load_rewritten_file_is_parsed_again(records_path):
+    assert len(CostRecords.load(records_path)) == len(RECORDS)
+    records_path.write_text("".join(json.dumps({**record, "cost": 1.0}) + "\n" for record in RECORDS[:3]))
+    assert CostRecords.load(records_path).costs.tolist() == [1.0, 1.0, 1.0]
+
+
+def test_load_invalid_sidecar_is_ignored(records_path):
+    (records_path.parent / (records_path.name + ".npz")).write_bytes(b"not a numpy file")
+    assert CostRecords.load(records_path).costs.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_load_a_year_of_records(tmp_path, monkeypatch):
+    # a year of 1000 requests per day
+    n_records = 365 * 1000
+    start = _timestamp("2024-01-01T00:00:00")
+    users, models = ["alice", "bob", "carol"], ["gpt-4o", "gpt-4o-mini", "claude-3-5-sonnet"]
+    path = tmp_path / "user_cost_records.jsonl"
+    path.write_text(
+        "".join(
+            json.dumps({"timestamp": start + i * 86.4, "user": users[i % 3], "model": models[i % 3 // 2], "cost": 0.01})
+            + "\n"
+            for i in range(n_records)
+        )
+    )
+    assert len(CostRecords.load(path)) == n_records
+
+    parsed = _count_parsed_records(monkeypatch)
+    with open(path, "a") as f:
+        f.write(json.dumps({"timestamp": start + 365 * 86400, "user": "dave", "model": "o1", "cost": 1.0}) + "\n")
+    started = time.perf_counter()
+    records = CostRecords.load(path)
+    elapsed = time.perf_counter() - started
+    assert parsed == [1]
+    assert len(records) == n_records + 1
+    assert records.by_period(Period.month)[0].tolist()[-1] == np.datetime64("2024-12-01")
+    assert elapsed < 0.5